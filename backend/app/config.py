@@ -9,5 +9,54 @@ load_dotenv()
 
 OPENAI_MODEL = "gpt-4o"
 OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_BATCH_SIZE = 2048 # Max inputs the embeddings endpoint accepts per request
+EMBEDDING_MAX_REQUEST_TOKENS = 300000 # Max total tokens the embeddings endpoint accepts per request
+EMBEDDING_MAX_INPUT_TOKENS = 8000 # Longer inputs are truncated; the endpoint rejects inputs over 8191 tokens
+EMBEDDING_DIM = 1536 # Output size of OPENAI_EMBEDDING_MODEL
+EMBEDDING_FALLBACK_CONCURRENCY = 8 # Single-text embedding requests in flight when a batched response comes back short
 
-MAX_PAPER_CHARS = 6000
\ No newline at end of file
+MAX_PAPER_CHARS = 6000
+
+# Paper text sent to extract_basic_info is trimmed to this many tokens, keeping the last
+# EXTRACT_TAIL_TOKENS (conclusions, limitations) after the head
+EXTRACT_TOKEN_BUDGET = 12000
+EXTRACT_TAIL_TOKENS = 2000
+# Longer papers are extracted in at most EXTRACT_MAX_WINDOWS concurrent windows of at most EXTRACT_WINDOW_TOKENS
+# tokens, overlapping by EXTRACT_WINDOW_OVERLAP; papers longer than those windows cover are trimmed (head and tail) first
+EXTRACT_WINDOW_TOKENS = 8000
+EXTRACT_WINDOW_OVERLAP = 50
+EXTRACT_MAX_WINDOWS = 5
+
+# Skip the LLM rerank in rank_chunks when cosine already separates a clear top 5: the 5th best chunk
+# scores above RERANK_SHORTCIRCUIT_MIN_SCORE and beats the 6th by more than RERANK_SHORTCIRCUIT_GAP
+ENABLE_LLM_RERANK_SHORTCIRCUIT = os.getenv("ENABLE_LLM_RERANK_SHORTCIRCUIT", "1") == "1"
+RERANK_SHORTCIRCUIT_GAP = 0.1
+RERANK_SHORTCIRCUIT_MIN_SCORE = 0.6
+
+# Chunk sets with more distinct chunks than this are scored in a worker thread, off the event loop
+SCORING_THREAD_MIN_ROWS = 10000
+
+MAX_CONCURRENT_LLM_CALLS = 20 # Per-paper LLM calls in flight at once when ranking related papers
+BATCH_POLL_INTERVAL = 60 # Seconds between status checks of an OpenAI Batch API job
+
+# On-disk cache for embeddings and parsed paper text
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "/var/cache/arxtract_emb")
+EMBED_MEMORY_CACHE_SIZE = 10000 # Embeddings kept in the per-process LRU in front of the disk cache
+
+# In-memory paper chunk cache, bounded by approximate size in bytes and entry age in seconds
+CHUNK_CACHE_MAX_BYTES = 512 * 1024 * 1024
+CHUNK_CACHE_TTL = 3600
+
+# In-memory parsed paper text cache, shared by all endpoints (same TTL as the chunk cache)
+PAPER_TEXT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Memory-mapped store of paper abstract embeddings used to rank related papers
+EMBED_STORE_DIR = os.getenv("EMBED_STORE_DIR", "/var/cache/arxtract_store")
+EMBED_STORE_INITIAL_ROWS = 4096
+
+# Semantic caches of LLM results, stored on disk alongside the embedding cache: a query whose embedding
+# has cosine similarity >= the threshold with an earlier query in the same scope reuses its result
+SEMANTIC_CACHE_TTL = 24 * 3600
+SEMANTIC_CACHE_MAX_QUERIES = 64 # Per scope, oldest dropped first
+CHAT_CACHE_SIMILARITY = 0.95 # /paper/chat answers, scoped by paper
+ABSTRACT_SCORE_CACHE_SIMILARITY = 0.97 # LLM abstract relevance scores, scoped by abstract
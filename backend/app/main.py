@@ -9,19 +9,30 @@ The API coordinates the following stages:
 - Returning structured analysis results to the frontend
 """
 
+import asyncio
 import logging
+import sys
+import numpy as np
+import orjson
+from cachetools import TTLCache
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 
 logger = logging.getLogger("uvicorn.error")
 
 from pydantic import BaseModel
 
-from app.services.llm_client import extract_basic_info, expand_query, extract_keywords, answer_from_chunks
-from app.services.arxiv_client import parse_arxiv_paper, fetch_arxiv_abstract, extract_arxiv_id, chunk_text, strip_references, search_arxiv
-from app.services.similarity import rank_chunks, rank_papers, retrieve_top_chunks
-from app.schemas import ChatResponse
+from app.services.llm_client import extract_basic_info_mapreduce, expand_query, extract_keywords, answer_from_chunks, stream_answer_from_chunks
+from app.services.arxiv_client import create_http_client, parse_arxiv_paper, fetch_arxiv_abstract, extract_arxiv_id, chunk_text, span_text, strip_references, search_arxiv
+from app.services.similarity import get_embeddings, rank_chunks, rank_papers, retrieve_top_chunks
+from app.schemas import ChatResponse, ChunkScore, PaperExtraction, SimilarityResult, RelatedPapersResult
+from app.services.semantic_cache import SemanticCache
+from app.config import CHUNK_CACHE_MAX_BYTES, CHUNK_CACHE_TTL, PAPER_TEXT_CACHE_MAX_BYTES, CHAT_CACHE_SIMILARITY
 
+# Endpoints declare their response schema as the return type, so FastAPI serializes
+# responses straight to JSON bytes through Pydantic's Rust serializer (dump_json)
+# instead of jsonable_encoder + the stdlib json module.
 app = FastAPI(
     title = "Paper Intelligence API",
     version = "0.1.0",
@@ -36,8 +47,95 @@ app.add_middleware(
     allow_headers = ["*"],
 )
 
-# In-memory cache of paper chunks keyed by arxiv_id
-paper_chunks_cache: dict[str, list[str]] = {}
+# In-memory cache of parsed paper text keyed by arxiv_id, in front of the on-disk text cache
+paper_text_cache: TTLCache = TTLCache(
+    maxsize = PAPER_TEXT_CACHE_MAX_BYTES,
+    ttl = CHUNK_CACHE_TTL,
+    getsizeof = sys.getsizeof,
+)
+
+def _chunks_nbytes(paper_chunks: tuple[list[str], list[tuple[int, int]]]) -> int:
+    """_chunks_nbytes(paper_chunks) approximates the memory held by a paper's sentences and chunk spans."""
+    sentences, spans = paper_chunks
+    return (
+        sys.getsizeof(sentences) + sum(sys.getsizeof(s) for s in sentences)
+        + sys.getsizeof(spans) + len(spans) * sys.getsizeof((0, 0))
+    )
+
+# In-memory cache of paper chunks keyed by arxiv_id, stored as (sentences, chunk spans).
+# Bounded by total bytes (least recently used papers are evicted first) and by age.
+paper_chunks_cache: TTLCache = TTLCache(
+    maxsize = CHUNK_CACHE_MAX_BYTES,
+    ttl = CHUNK_CACHE_TTL,
+    getsizeof = _chunks_nbytes,
+)
+
+# One lock per paper currently being parsed / chunked, so concurrent first hits
+# (e.g. /paper/from-arxiv and /paper/similarity fired together) download the PDF once
+_text_locks: dict[str, asyncio.Lock] = {}
+_chunk_locks: dict[str, asyncio.Lock] = {}
+
+# Semantic cache of chat answers, scoped by arxiv_id
+chat_answer_cache = SemanticCache("chat", CHAT_CACHE_SIMILARITY)
+
+@app.on_event("startup")
+async def open_http_client():
+    """open_http_client() creates the shared arXiv HTTP client so connections are reused across requests."""
+    app.state.http = create_http_client()
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await app.state.http.aclose()
+
+async def _get_or_compute(cache: TTLCache, locks: dict[str, asyncio.Lock], key: str, compute):
+    """
+    _get_or_compute(cache, locks, key, compute) returns cache[key], awaiting compute() to fill it on a miss.
+    Concurrent misses for the same key wait for a single computation.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock = locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            value = cache.get(key)
+            if value is not None:
+                return value
+
+            value = await compute()
+            try:
+                cache[key] = value
+            except ValueError:
+                pass # Larger than the whole cache, serve it uncached
+            return value
+    finally:
+        if not lock.locked():
+            locks.pop(key, None)
+
+async def get_paper_text(arxiv_input: str) -> str:
+    """
+    get_paper_text(arxiv_input) returns the parsed text of a paper, from paper_text_cache when possible.
+    Every endpoint goes through here, so whichever touches a paper first populates it for the others.
+    Raises ValueError for invalid arXiv input.
+    """
+    arxiv_id = extract_arxiv_id(arxiv_input)
+    return await _get_or_compute(
+        paper_text_cache, _text_locks, arxiv_id,
+        lambda: parse_arxiv_paper(app.state.http, arxiv_id),
+    )
+
+async def get_chunks(arxiv_id: str) -> tuple[list[str], list[tuple[int, int]]]:
+    """
+    get_chunks(arxiv_id) returns the (sentences, chunk spans) of a paper, from paper_chunks_cache when possible.
+    On a miss the paper text is reference-stripped and chunked, then cached.
+    """
+    async def compute():
+        text = await get_paper_text(arxiv_id)
+        # Cleaning and chunking a full paper is CPU-bound, keep it off the event loop
+        return await asyncio.to_thread(lambda: chunk_text(strip_references(text)))
+
+    return await _get_or_compute(paper_chunks_cache, _chunk_locks, arxiv_id, compute)
 
 @app.get("/health")
 def health_check():
@@ -51,10 +149,10 @@ class SimilarityRequest(BaseModel):
     query: str
 
 @app.post("/paper/from-arxiv")
-def paper_from_arxiv(req: ArxivRequest):
+async def paper_from_arxiv(req: ArxivRequest) -> PaperExtraction:
     """paper_from_arxiv(req) analyzes an arXiv paper given a user query and arXiv identifier or URL."""
     try:
-        text = parse_arxiv_paper(req.arxiv_id)
+        text = await get_paper_text(req.arxiv_id)
     except ValueError as e:
         raise HTTPException(
             status_code = 400,
@@ -67,7 +165,8 @@ def paper_from_arxiv(req: ArxivRequest):
         )
 
     try:
-        result = extract_basic_info(text)
+        # The bibliography carries no extractable fields; leave it out of the windows
+        result = await extract_basic_info_mapreduce(strip_references(text))
     except Exception as e:
         logger.error(f"LLM extraction failed: {e}", exc_info=True)
         raise HTTPException(
@@ -78,27 +177,30 @@ def paper_from_arxiv(req: ArxivRequest):
 
 
 @app.post("/paper/similarity")
-def paper_similarity(req: SimilarityRequest):
+async def paper_similarity(req: SimilarityRequest) -> SimilarityResult:
     """paper_similarity(req) computes the relevance of an arXiv paper to a user’s research interest."""
     try:
-        text = parse_arxiv_paper(req.arxiv_id)
+        arxiv_id = extract_arxiv_id(req.arxiv_id)
+    except ValueError as e:
+        raise HTTPException(status_code = 400, detail = f"Invalid arXiv input: {str(e)}")
+
+    # PDF download, abstract lookup and query expansion are independent, so run them concurrently
+    # Chunks are cached here for the chat endpoint too
+    try:
+        (sentences, spans), abstract, expanded = await asyncio.gather(
+            get_chunks(arxiv_id),
+            fetch_arxiv_abstract(app.state.http, arxiv_id),
+            expand_query(req.query),
+        )
     except ValueError as e:
         raise HTTPException(status_code = 400, detail = f"Invalid arXiv input: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"arXiv parsing failed: {str(e)}")
 
-    arxiv_id = extract_arxiv_id(req.arxiv_id)
-    abstract = fetch_arxiv_abstract(arxiv_id)
-    text = strip_references(text)
-    chunks = chunk_text(text)
-
-    # Cache chunks for the chat endpoint
-    paper_chunks_cache[arxiv_id] = chunks
-
-    expanded = expand_query(req.query)
+    chunks = [span_text(sentences, span) for span in spans]
 
     try:
-        result = rank_chunks(query = expanded, abstract = abstract, chunks = chunks)
+        result = await rank_chunks(query = expanded, abstract = abstract, chunks = chunks)
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"Similarity computation failed: {str(e)}")
 
@@ -106,18 +208,20 @@ def paper_similarity(req: SimilarityRequest):
 
 
 @app.post("/paper/related")
-def paper_related(req: SimilarityRequest):
+async def paper_related(req: SimilarityRequest) -> RelatedPapersResult:
     """paper_related(req) finds related arXiv papers by searching with extracted keywords and ranking by similarity."""
     try:
         input_arxiv_id = extract_arxiv_id(req.arxiv_id)
     except ValueError as e:
         raise HTTPException(status_code = 400, detail = f"Invalid arXiv input: {str(e)}")
 
-    expanded = expand_query(req.query)
-    keywords = extract_keywords(req.query)
+    expanded, keywords = await asyncio.gather(
+        expand_query(req.query),
+        extract_keywords(req.query),
+    )
 
     try:
-        papers = search_arxiv(keywords)
+        papers = await search_arxiv(app.state.http, keywords)
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"arXiv search failed: {str(e)}")
 
@@ -125,43 +229,111 @@ def paper_related(req: SimilarityRequest):
     papers = [p for p in papers if p["arxiv_id"] != input_arxiv_id]
 
     try:
-        result = rank_papers(query = expanded, papers = papers)
+        result = await rank_papers(query = expanded, papers = papers)
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"Paper ranking failed: {str(e)}")
 
     return result
 
 
-@app.post("/paper/chat")
-def paper_chat(req: SimilarityRequest):
-    """paper_chat(req) answers a follow-up question about a paper using chunk retrieval + LLM."""
+async def _prepare_chat(req: SimilarityRequest) -> tuple[str, np.ndarray, ChatResponse | None, list[ChunkScore]]:
+    """
+    _prepare_chat(req) runs the retrieval half of /paper/chat and /paper/chat/stream.
+    Returns (arxiv_id, query embedding, cached response, chunks to answer from); when an answer
+    to a near-duplicate question is cached, the chunk list is empty and the paper is neither fetched,
+    chunked nor searched.
+    """
     try:
         arxiv_id = extract_arxiv_id(req.arxiv_id)
     except ValueError as e:
         raise HTTPException(status_code = 400, detail = f"Invalid arXiv input: {str(e)}")
 
-    # Get chunks from cache or fetch/chunk on demand
-    if arxiv_id not in paper_chunks_cache:
-        try:
-            text = parse_arxiv_paper(req.arxiv_id)
-        except Exception as e:
-            raise HTTPException(status_code = 500, detail = f"arXiv parsing failed: {str(e)}")
-        text = strip_references(text)
-        paper_chunks_cache[arxiv_id] = chunk_text(text)
+    try:
+        query_emb = (await get_embeddings([req.query]))[0]
+    except Exception as e:
+        raise HTTPException(status_code = 500, detail = f"Chunk retrieval failed: {str(e)}")
 
-    chunks = paper_chunks_cache[arxiv_id]
+    # Near-duplicate questions on the same paper skip fetching, chunking, retrieval and generation entirely.
+    # Chunking is deterministic, so a cached answer stays valid after the paper's chunks expire and are rebuilt.
+    cached = chat_answer_cache.lookup(arxiv_id, query_emb)
+    if cached is not None:
+        return arxiv_id, query_emb, cached, []
+
+    # Get chunks from cache or fetch/chunk on demand
+    try:
+        sentences, spans = await get_chunks(arxiv_id)
+    except Exception as e:
+        raise HTTPException(status_code = 500, detail = f"arXiv parsing failed: {str(e)}")
+    chunks = [span_text(sentences, span) for span in spans]
 
     try:
-        top_chunks = retrieve_top_chunks(query = req.query, chunks = chunks, k = 15)
+        # The query embedding is now in the embedding cache, so this does not re-embed it
+        top_chunks = await retrieve_top_chunks(query = req.query, chunks = chunks, k = 15)
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"Chunk retrieval failed: {str(e)}")
 
+    # Chunks are embedded without overlap; widen the selected ones by a sentence for the answer
+    top_chunks = [
+        c.model_copy(update = {"text": span_text(sentences, spans[c.chunk_index], overlap = 1)})
+        for c in top_chunks
+    ]
+    return arxiv_id, query_emb, None, top_chunks
+
+
+@app.post("/paper/chat")
+async def paper_chat(req: SimilarityRequest) -> ChatResponse:
+    """paper_chat(req) answers a follow-up question about a paper using chunk retrieval + LLM."""
+    arxiv_id, query_emb, cached, top_chunks = await _prepare_chat(req)
+    if cached is not None:
+        return cached
     chunk_texts = [c.text for c in top_chunks]
 
     try:
-        answer = answer_from_chunks(query = req.query, chunks = chunk_texts)
+        answer = await answer_from_chunks(query = req.query, chunks = chunk_texts)
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"Answer generation failed: {str(e)}")
 
-    return ChatResponse(answer = answer, chunks_used = top_chunks)
+    response = ChatResponse(answer = answer, chunks_used = top_chunks)
+    # answer_from_chunks reports LLM failures in the answer text; don't replay those
+    if not answer.startswith("Error generating answer"):
+        chat_answer_cache.store(arxiv_id, query_emb, response)
+    return response
+
+
+def _sse(event: str, data) -> str:
+    """_sse(event, data) formats one server-sent event with a JSON-encoded payload."""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+@app.post("/paper/chat/stream")
+async def paper_chat_stream(req: SimilarityRequest) -> StreamingResponse:
+    """
+    paper_chat_stream(req) is /paper/chat as a stream of server-sent events: a "chunks" event
+    with the chunks used, "answer" events carrying the answer text as it is generated, then "done"
+    (or "error" if generation fails part-way).
+    """
+    arxiv_id, query_emb, cached, top_chunks = await _prepare_chat(req)
+
+    async def events():
+        if cached is not None:
+            yield _sse("chunks", [c.model_dump() for c in cached.chunks_used])
+            yield _sse("answer", cached.answer)
+            yield _sse("done", None)
+            return
+
+        yield _sse("chunks", [c.model_dump() for c in top_chunks])
+        parts = []
+        try:
+            async for text in stream_answer_from_chunks(query = req.query, chunks = [c.text for c in top_chunks]):
+                parts.append(text)
+                yield _sse("answer", text)
+        except Exception as e:
+            logger.error(f"Streaming answer failed: {e}", exc_info=True)
+            yield _sse("error", f"Error generating answer: {str(e)}")
+            return
+
+        answer = "".join(parts).strip()
+        if answer:
+            chat_answer_cache.store(arxiv_id, query_emb, ChatResponse(answer = answer, chunks_used = top_chunks))
+        yield _sse("done", None)
 
+    return StreamingResponse(events(), media_type = "text/event-stream")
@@ -23,7 +23,7 @@ class RelatedPaper(BaseModel):
     authors: List[str] = Field(default_factory = list, description = "List of author names")
     abstract: str = Field(description = "Paper abstract")
     url: str = Field(description = "arXiv URL")
-    score: float = Field(description = "Cosine similarity score (0-10)")
+    score: float = Field(description = "Relevance score (0-10): cosine similarity averaged with the LLM judgment")
 
 class RelatedPapersResult(BaseModel):
     papers: List[RelatedPaper] = Field(description = "Related papers ranked by similarity")
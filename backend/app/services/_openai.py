@@ -0,0 +1,44 @@
+"""
+_openai.py
+The single AsyncOpenAI client shared by llm_client and similarity.
+
+Both modules send their chat and embedding requests through one httpx
+connection pool. HTTP/2 multiplexes concurrent requests over a few
+connections to the API host, and the pool limits are raised so that
+gathered calls (abstract scoring, embedding batches, reranking) are not
+queued behind httpx's defaults.
+
+Calls on the request path go through interactive_client and retry_transient
+instead: each attempt is made once by the SDK, and a transient failure
+(connection reset, timeout, 429, 5xx) is retried after a jittered exponential
+backoff. Short calls also pass OPENAI_CALL_TIMEOUT, so a stuck attempt is
+abandoned and retried rather than waited on for the full client timeout.
+"""
+
+import httpx
+from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, InternalServerError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+OPENAI_MAX_RETRIES = 2
+OPENAI_TIMEOUT = httpx.Timeout(60.0, connect = 5.0)
+OPENAI_CALL_TIMEOUT = 15.0 # Per attempt, for calls with short outputs (scores, keywords, embeddings)
+
+client = AsyncOpenAI(
+    max_retries = OPENAI_MAX_RETRIES,
+    timeout = OPENAI_TIMEOUT,
+    http_client = httpx.AsyncClient(
+        http2 = True,
+        timeout = OPENAI_TIMEOUT,
+        limits = httpx.Limits(max_connections = 100, max_keepalive_connections = 50),
+    ),
+)
+
+# Same connection pool, but retries are left to retry_transient
+interactive_client = client.with_options(max_retries = 0)
+
+retry_transient = retry(
+    retry = retry_if_exception_type((APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)),
+    wait = wait_exponential_jitter(initial = 1, max = 8),
+    stop = stop_after_attempt(3),
+    reraise = True,
+)
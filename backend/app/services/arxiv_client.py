@@ -10,6 +10,8 @@ This module is responsible for:
 All returned data is intended to be consumed by other services.
 
 Functions in this program:
+- create_http_client
+- _send
 - extract_arxiv_id
 - fetch_arxiv_pdf
 - _parse_pdf
@@ -18,18 +20,77 @@ Functions in this program:
 - strip_references
 - remove_symbol_noise
 - _split_sentences
+- _split_long_sentence
 - chunk_text
+- span_text
 - parse_arxiv_paper
 """
 
+import asyncio
+import io
 import re
-import xml.etree.ElementTree as ET
-import requests
+import httpx
+from lxml import etree
 import fitz
+from app.services.embed_cache import get_cached_paper_text, store_paper_text
 
 ARXIV_PDF_BASE_URL = "https://arxiv.org/pdf/"
 ARXIV_API_BASE_URL = "http://export.arxiv.org/api/query"
 
+# Transient arXiv responses worth retrying, with exponential backoff between attempts
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.2
+
+# arXiv ID patterns: raw ID (optional version suffix), abs/pdf URL, and an ID anywhere in an Atom entry URL
+_RAW_ID = re.compile(r"(\d{4}\.\d{4,5})(?:v\d+)?$")
+_URL_ID = re.compile(r"arxiv\.org/(abs|pdf)/(\d{4}\.\d{4,5})")
+_ARXIV_ID_IN_URL = re.compile(r"(\d{4}\.\d{4,5})")
+
+# Patterns run over the full paper text, compiled once at import
+_REFS = re.compile(r'\n\s*(?:References|REFERENCES|Bibliography|BIBLIOGRAPHY)\s*\n')
+_SYMS = re.compile(r"[^\w\s.,;:()\-/%]+")
+_SENT = re.compile(r'(?<=[.!?])\s+')
+
+# Atom namespace used by the arXiv API responses
+ATOM_NS = {"atom": "http://www.w3.org/2005/Atom"}
+
+# Circled numbers and math-like unicode junk, deleted in one str.translate pass
+_DROP_TABLE = str.maketrans("", "", "①②③④⑤⑥⑦⑧⑨⑩¿¡¬√")
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    create_http_client() builds the shared async HTTP client used for all arXiv requests.
+    The client is created once at app startup and passed into the fetch functions below.
+    Its keep-alive connection pool lets consecutive requests reuse open TCP/TLS connections,
+    HTTP/2 lets concurrent requests to the same host share one connection,
+    and the transport reconnects on connection errors.
+    """
+    return httpx.AsyncClient(
+        headers = {"User-Agent": "ArXtract/0.1"},
+        timeout = 90,
+        follow_redirects = True,
+        transport = httpx.AsyncHTTPTransport(
+            http2 = True,
+            retries = MAX_RETRIES,
+            limits = httpx.Limits(max_connections = 32, max_keepalive_connections = 16),
+        ),
+    )
+
+async def _send(client: httpx.AsyncClient, url: str, stream: bool = False, **kwargs) -> httpx.Response:
+    """
+    _send(client, url) issues a GET request, retrying RETRY_STATUSES responses with exponential backoff.
+    With stream = True the body is left unread so the caller can consume it incrementally;
+    the caller is then responsible for closing the response.
+    """
+    request = client.build_request("GET", url, **kwargs)
+    for attempt in range(MAX_RETRIES + 1):
+        response = await client.send(request, stream = stream)
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            return response
+        await response.aclose()
+        await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
 def extract_arxiv_id(arxiv_input: str) -> str:
     """
     extract_arxiv_id(arxiv_input) extracts and normalizes an arXiv identifier from the user-provided input string.
@@ -47,80 +108,82 @@ def extract_arxiv_id(arxiv_input: str) -> str:
     arxiv_input = arxiv_input.strip() # Strip whitespaces
 
     # Match raw ID
-    raw_match = re.match(r"(\d{4}\.\d{4,5})(?:v\d+)?$", arxiv_input)
+    raw_match = _RAW_ID.match(arxiv_input)
     if raw_match:
         return raw_match.group(1)
 
     # Match URL
-    url_match = re.search(r"arxiv\.org/(abs|pdf)/(\d{4}\.\d{4,5})", arxiv_input)
+    url_match = _URL_ID.search(arxiv_input)
     if url_match:
         return url_match.group(2)
 
     raise ValueError("Invalid arXiv identifier or URL")
 
 
-def fetch_arxiv_pdf(arxiv_id: str) -> bytes:
+async def fetch_arxiv_pdf(client: httpx.AsyncClient, arxiv_id: str) -> io.BytesIO:
     """
-    fetch_arxiv_pdf(arxiv_id) returns the arXiv PDF as bytes for the given paper ID.
+    fetch_arxiv_pdf(client, arxiv_id) returns the arXiv PDF for the given paper ID as an in-memory file.
+    The body is streamed into a single BytesIO buffer, which PyMuPDF can open
+    without copying, so the PDF is only held in memory once.
     """
     pdf_url = f"{ARXIV_PDF_BASE_URL}{arxiv_id}.pdf"
-    response = requests.get(
-        pdf_url,
-        headers = {"User-Agent": "ArXtract/0.1"},
-        timeout = 90,
-    )
-    if response.status_code != 200:
-        raise ValueError(
-            f"Failed to download arXiv PDF (status {response.status_code})"
-        )
-    return response.content
-
-def _parse_pdf(pdf_bytes: bytes) -> str:
+    response = await _send(client, pdf_url, stream = True)
+    try:
+        if response.status_code != 200:
+            raise ValueError(
+                f"Failed to download arXiv PDF (status {response.status_code})"
+            )
+        pdf_file = io.BytesIO()
+        async for chunk in response.aiter_bytes(65536):
+            pdf_file.write(chunk)
+    finally:
+        await response.aclose()
+    return pdf_file
+
+def _parse_pdf(pdf: bytes | io.BytesIO) -> str:
     """
-    _parse_pdf parses PDF bytes and extracts text content.
-    Function takes raw PDF bytes, loads the document into memory,
+    _parse_pdf parses a PDF and extracts text content.
+    Function takes raw PDF bytes or an in-memory PDF file, loads the document,
     and extracts readable text for further processing.
     """
-    doc = fitz.open(stream = pdf_bytes, filetype = "pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
+    with fitz.open(stream = pdf, filetype = "pdf") as doc:
+        # Join once instead of += per page (avoids re-copying the growing string).
+        # Pages are read serially: PyMuPDF documents are not safe to share across threads.
+        return "".join(page.get_text("text") for page in doc)
 
-def fetch_arxiv_abstract(arxiv_id: str) -> str:
+async def fetch_arxiv_abstract(client: httpx.AsyncClient, arxiv_id: str) -> str:
     """
     fetch_arxiv_abstract fetches the abstract directly from the arXiv Atom API.
     The abstract is returned as plain text and is intended for similarity scoring.
     """
-    response = requests.get(
+    response = await _send(
+        client,
         ARXIV_API_BASE_URL,
         params = {"id_list": arxiv_id},
-        headers = {"User-Agent": "ArXtract/0.1"},
-        timeout = 90,
     )
     if response.status_code != 200:
         raise ValueError(f"arXiv API request failed (status {response.status_code})")
 
-    root = ET.fromstring(response.text)
-    ns = {"atom": "http://www.w3.org/2005/Atom"}
-    entry = root.find("atom:entry", ns)
+    root = etree.fromstring(response.content)
+    entry = root.find("atom:entry", ATOM_NS)
     if entry is None:
         raise ValueError("Paper not found on arXiv")
 
-    summary = entry.find("atom:summary", ns)
+    summary = entry.find("atom:summary", ATOM_NS)
     if summary is None or not summary.text:
         raise ValueError("No abstract available for this paper")
 
-    abstract = re.sub(r'\s+', ' ', summary.text.strip())
+    abstract = " ".join(summary.text.split())
     return abstract
 
-def search_arxiv(keywords: str, max_results: int = 5) -> list[dict]:
+async def search_arxiv(client: httpx.AsyncClient, keywords: str, max_results: int = 5) -> list[dict]:
     """
-    search_arxiv(keywords) queries the arXiv API with the given keywords
+    search_arxiv(client, keywords) queries the arXiv API with the given keywords
     and returns a list of matching papers with their metadata.
     Each paper dict contains: arxiv_id, title, authors, abstract, url.
     """
-    response = requests.get(
+    response = await _send(
+        client,
         ARXIV_API_BASE_URL,
         params = {
             "search_query": f"all:{keywords}",
@@ -128,36 +191,33 @@ def search_arxiv(keywords: str, max_results: int = 5) -> list[dict]:
             "sortBy": "relevance",
             "sortOrder": "descending",
         },
-        headers = {"User-Agent": "ArXtract/0.1"},
-        timeout = 90,
     )
     if response.status_code != 200:
         raise ValueError(f"arXiv search failed (status {response.status_code})")
 
-    root = ET.fromstring(response.text)
-    ns = {"atom": "http://www.w3.org/2005/Atom"}
+    root = etree.fromstring(response.content)
 
     papers = []
-    for entry in root.findall("atom:entry", ns):
+    for entry in root.iterfind("atom:entry", ATOM_NS):
         # Extract arXiv ID from the entry id URL
-        entry_id = entry.find("atom:id", ns)
+        entry_id = entry.find("atom:id", ATOM_NS)
         if entry_id is None or not entry_id.text:
             continue
         # ID looks like http://arxiv.org/abs/2401.01234v1
-        arxiv_id_match = re.search(r"(\d{4}\.\d{4,5})", entry_id.text)
+        arxiv_id_match = _ARXIV_ID_IN_URL.search(entry_id.text)
         if not arxiv_id_match:
             continue
         arxiv_id = arxiv_id_match.group(1)
 
-        title_el = entry.find("atom:title", ns)
-        title = re.sub(r'\s+', ' ', title_el.text.strip()) if title_el is not None and title_el.text else "Untitled"
+        title_el = entry.find("atom:title", ATOM_NS)
+        title = " ".join(title_el.text.split()) if title_el is not None and title_el.text else "Untitled"
 
-        summary_el = entry.find("atom:summary", ns)
-        abstract = re.sub(r'\s+', ' ', summary_el.text.strip()) if summary_el is not None and summary_el.text else ""
+        summary_el = entry.find("atom:summary", ATOM_NS)
+        abstract = " ".join(summary_el.text.split()) if summary_el is not None and summary_el.text else ""
 
         authors = []
-        for author_el in entry.findall("atom:author", ns):
-            name_el = author_el.find("atom:name", ns)
+        for author_el in entry.iterfind("atom:author", ATOM_NS):
+            name_el = author_el.find("atom:name", ATOM_NS)
             if name_el is not None and name_el.text:
                 authors.append(name_el.text.strip())
 
@@ -174,10 +234,7 @@ def search_arxiv(keywords: str, max_results: int = 5) -> list[dict]:
 
 def strip_references(text: str) -> str:
     """strip_references(text) removes the References/Bibliography section and everything after it."""
-    pattern = re.compile(
-        r'\n\s*(?:References|REFERENCES|Bibliography|BIBLIOGRAPHY)\s*\n',
-    )
-    match = pattern.search(text)
+    match = _REFS.search(text)
     if match:
         return text[:match.start()].strip()
     return text
@@ -185,55 +242,70 @@ def strip_references(text: str) -> str:
 def remove_symbol_noise(text: str) -> str:
     """remove_symbol_noise(str) removes unicode junk and repeated non-alphanumeric symbols from PDF text."""
     # Remove circled numbers and math-like unicode junk
-    text = re.sub(r"[①②③④⑤⑥⑦⑧⑨⑩]", "", text)
-    text = re.sub(r"[¿¡¬√]", "", text)
+    text = text.translate(_DROP_TABLE)
     # Remove repeated non-alphanumeric symbols
-    text = re.sub(r"[^\w\s.,;:()\-/%]+", " ", text)
-    # Normalize whitespace
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    text = _SYMS.sub(" ", text)
+    # Normalize whitespace (split/join runs in C and also trims the ends)
+    return " ".join(text.split())
 
 def _split_sentences(text: str) -> list[str]:
     """_split_sentences(str) splits text into sentences on . ! ? followed by whitespace or end."""
-    parts = re.split(r'(?<=[.!?])\s+', text.strip())
+    parts = _SENT.split(text.strip())
     return [s for s in parts if s]
 
 
-def chunk_text(text: str, max_words: int = 250) -> list[str]:
+def _split_long_sentence(sentence: str, max_words: int) -> list[str]:
+    """_split_long_sentence(sentence, max_words) cuts a run-on "sentence" (e.g. a flattened table) into max_words-word pieces."""
+    if sentence.count(" ") < max_words:
+        return [sentence]
+    words = sentence.split(" ")
+    return [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words)]
+
+
+def chunk_text(text: str, max_words: int = 250) -> tuple[list[str], list[tuple[int, int]]]:
     """
     Split paper text into sentence-aware chunks of ~250 words.
-    Each chunk starts at a sentence boundary. Consecutive chunks
-    overlap by one sentence for continuity.
+    Each chunk starts at a sentence boundary and chunks do not overlap,
+    so no sentence is embedded twice. Sentences longer than max_words are cut into
+    max_words-word pieces, so no chunk exceeds the embedding input limit.
+    Returns the cleaned sentences and each chunk's [start, end) sentence span;
+    use span_text to build a chunk's text (optionally with overlap for continuity).
     """
     cleaned = remove_symbol_noise(text)
-    sentences = _split_sentences(cleaned)
-    if not sentences:
-        return []
-
-    chunks = []
-    i = 0
-    while i < len(sentences):
-        current_words = 0
-        j = i
-        while j < len(sentences) and current_words < max_words:
-            current_words += len(sentences[j].split())
-            j += 1
-        chunk = " ".join(sentences[i:j])
-        if chunk:
-            chunks.append(chunk)
-        if j >= len(sentences):
-            break
-        # Overlap: next chunk starts one sentence back
-        i = max(j - 1, i + 1)
-    return chunks
-
-def parse_arxiv_paper(arxiv_input: str) -> str:
-    """
-    parse_arxiv_paper(arxiv_input) downloads and parses the full text of an arXiv paper.
+    sentences = [piece for sentence in _split_sentences(cleaned) for piece in _split_long_sentence(sentence, max_words)]
+
+    # Sentences are single-space separated after cleaning, so spaces + 1 = words
+    spans = []
+    start = 0
+    current_words = 0
+    for end, sentence in enumerate(sentences, start = 1):
+        current_words += sentence.count(" ") + 1
+        if current_words >= max_words:
+            spans.append((start, end))
+            start = end
+            current_words = 0
+    if start < len(sentences):
+        spans.append((start, len(sentences)))
+    return sentences, spans
+
+def span_text(sentences: list[str], span: tuple[int, int], overlap: int = 0) -> str:
+    """
+    span_text(sentences, span, overlap) joins the sentences of a chunk span into its text.
+    With overlap > 0 the chunk is widened that many sentences back into the previous chunk.
+    """
+    start, end = span
+    return " ".join(sentences[max(start - overlap, 0):end])
+
+async def parse_arxiv_paper(client: httpx.AsyncClient, arxiv_input: str) -> str:
+    """
+    parse_arxiv_paper(client, arxiv_input) downloads and parses the full text of an arXiv paper.
 
     This function orchestrates the initial ingestion pipeline by
     normalizing a user-provided arXiv input, downloading the
     corresponding PDF, and extracting raw text from the document.
+    PDF parsing is CPU-bound, so it runs in a worker thread to keep the event loop free.
+
+    Parsed text is cached on disk by arXiv ID, so a paper is only downloaded once.
 
     No text cleaning, reference stripping, or chunking is performed.
     Those steps are handled by later services
@@ -241,10 +313,15 @@ def parse_arxiv_paper(arxiv_input: str) -> str:
     try:
         arxiv_id = extract_arxiv_id(arxiv_input)                        # Get the ID
         print(f"DEBUG arxiv_id: {arxiv_id}")
-        pdf_bytes = fetch_arxiv_pdf(arxiv_id)                           # Download the pdf
+        cached = get_cached_paper_text(arxiv_id)
+        if cached is not None:
+            return cached
+        pdf_file = await fetch_arxiv_pdf(client, arxiv_id)              # Download the pdf
         print(f"DEBUG PDF fetched successfully")
-        text = _parse_pdf(pdf_bytes)                                    # Extract the text
+        text = await asyncio.to_thread(_parse_pdf, pdf_file)            # Extract the text
+        pdf_file.close()                                                # Free the PDF buffer now
         print(f"DEBUG PDF parsed, extracted {len(text)} characters")
+        store_paper_text(arxiv_id, text)
         return text
     except Exception as e:
         print(f"DEBUG ERROR in parse_arxiv_paper: {type(e).__name__}: {e}")
@@ -0,0 +1,92 @@
+"""
+embed_cache.py
+Persistent on-disk cache for embedding vectors and parsed paper text.
+This module is responsible for:
+- Memoizing text -> embedding vectors so identical chunks are never re-embedded
+- Quantizing embedding vectors to int8 for compact storage
+- Memoizing arXiv ID -> parsed PDF text so papers are not re-downloaded and re-parsed
+The cache lives on disk (diskcache, backed by SQLite) so it survives restarts
+and is shared by every worker process on the host. Recently used embeddings are
+also kept in a per-process LRU in front of it, skipping the SQLite read and decode;
+they are held as float16, half the memory of float32 with no measurable ranking loss.
+
+Functions in this program:
+- quantize_rows
+- _embedding_key
+- get_cached_embeddings
+- store_embeddings
+- get_cached_paper_text
+- store_paper_text
+"""
+
+import hashlib
+import numpy as np
+from cachetools import LRUCache
+from diskcache import Cache
+from app.config import OPENAI_EMBEDDING_MODEL, EMBED_CACHE_DIR, EMBED_MEMORY_CACHE_SIZE
+
+cache = Cache(EMBED_CACHE_DIR)
+memory_cache: LRUCache = LRUCache(maxsize = EMBED_MEMORY_CACHE_SIZE)
+
+def quantize_rows(embs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    quantize_rows(embs) linearly quantizes each row of a float matrix to int8.
+    Each row gets its own float32 scale (max |value| / 127), so row ≈ row_i8 * scale.
+    Returns (embs_i8, scales).
+    """
+    embs = np.atleast_2d(np.asarray(embs, dtype = np.float32))
+    scales = np.abs(embs).max(axis = 1) / 127
+    scales[scales == 0] = 1.0
+    embs_i8 = np.round(embs / scales[:, None]).astype(np.int8)
+    return embs_i8, scales.astype(np.float32)
+
+def _embedding_key(text: str) -> str:
+    """
+    _embedding_key(text) builds the cache key for a text's int8 embedding under the current embedding model.
+    The key only needs to be collision-resistant, not cryptographic, so a 128-bit BLAKE2b digest is used.
+    """
+    digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size = 16).hexdigest()
+    return digest + ":" + OPENAI_EMBEDDING_MODEL + ":i8"
+
+def get_cached_embeddings(texts: list[str]) -> list[np.ndarray | None]:
+    """
+    get_cached_embeddings(texts) looks up each text in the in-memory LRU, then on disk.
+    Returns a list aligned with texts holding the float16 vector on a hit and None on a miss.
+    Disk reads take no lock: SQLite's WAL mode lets them run alongside other workers' reads and writes.
+    """
+    results = []
+    for text in texts:
+        key = _embedding_key(text)
+        embedding = memory_cache.get(key)
+        if embedding is None:
+            raw = cache.get(key)
+            if raw is not None:
+                scale = np.frombuffer(raw[:4], dtype = np.float32)[0]
+                embedding = (np.frombuffer(raw[4:], dtype = np.int8).astype(np.float32) * scale).astype(np.float16)
+                memory_cache[key] = embedding
+        results.append(embedding)
+    return results
+
+def store_embeddings(texts: list[str], embeddings: np.ndarray) -> None:
+    """
+    store_embeddings(texts, embeddings) writes embeddings to the cache.
+    Vectors are stored int8-quantized (a float32 scale followed by the int8 values),
+    a quarter of the float32 size.
+    """
+    if not texts:
+        return
+    embs_i8, scales = quantize_rows(embeddings)
+    # One SQLite transaction for the whole batch instead of one per vector
+    with cache.transact():
+        for text, embedding, row, scale in zip(texts, embeddings, embs_i8, scales):
+            key = _embedding_key(text)
+            memory_cache[key] = embedding.astype(np.float16)
+            cache.set(key, scale.tobytes() + row.tobytes())
+
+def get_cached_paper_text(arxiv_id: str) -> str | None:
+    """get_cached_paper_text(arxiv_id) returns the previously parsed text of a paper, or None."""
+    return cache.get(f"paper_text:{arxiv_id}")
+
+def store_paper_text(arxiv_id: str, text: str) -> None:
+    """store_paper_text(arxiv_id, text) caches the parsed text of a paper."""
+    cache.set(f"paper_text:{arxiv_id}", text)
@@ -0,0 +1,102 @@
+"""
+embed_store.py
+Append-only, memory-mapped store of paper embeddings shared across requests and processes.
+This module is responsible for:
+- Keeping every stored paper's embedding rows in one contiguous float16 matrix on disk
+- Tracking which rows belong to which paper in a small SQLite index (arxiv_id -> row, n_rows)
+- Serving candidate rows for ranking as a single gather over the mapped matrix
+
+Reads go through the OS page cache with no per-key deserialization, so ranking
+stored papers is one fancy-index plus one matrix product.
+
+Functions in this program:
+- _map_matrix
+- lookup_rows
+- load_rows
+- append_rows
+"""
+
+import os
+import sqlite3
+import threading
+import numpy as np
+from app.config import OPENAI_EMBEDDING_MODEL, EMBEDDING_DIM, EMBED_STORE_DIR, EMBED_STORE_INITIAL_ROWS
+
+os.makedirs(EMBED_STORE_DIR, exist_ok = True)
+
+# One matrix + index per embedding model, since vectors from different models are not comparable
+_MATRIX_PATH = os.path.join(EMBED_STORE_DIR, f"{OPENAI_EMBEDDING_MODEL}.f16")
+_INDEX_PATH = os.path.join(EMBED_STORE_DIR, f"{OPENAI_EMBEDDING_MODEL}.sqlite")
+_ROW_BYTES = EMBEDDING_DIM * np.dtype(np.float16).itemsize
+
+_index = sqlite3.connect(_INDEX_PATH, check_same_thread = False, isolation_level = None)
+_index.execute(
+    "CREATE TABLE IF NOT EXISTS papers (arxiv_id TEXT PRIMARY KEY, row INTEGER NOT NULL, n_rows INTEGER NOT NULL)"
+)
+_lock = threading.Lock()
+_matrix: np.memmap | None = None
+
+def _map_matrix(min_rows: int) -> np.memmap:
+    """
+    _map_matrix(min_rows) returns the memory-mapped matrix, holding at least min_rows rows.
+    The backing file grows by doubling; it is remapped when it has been grown
+    (by this or another process) past the current mapping.
+    """
+    global _matrix
+    if _matrix is not None and len(_matrix) >= min_rows:
+        return _matrix
+
+    size = os.path.getsize(_MATRIX_PATH) if os.path.exists(_MATRIX_PATH) else 0
+    capacity = max(size // _ROW_BYTES, EMBED_STORE_INITIAL_ROWS)
+    while capacity < min_rows:
+        capacity *= 2
+    if size < capacity * _ROW_BYTES:
+        with open(_MATRIX_PATH, "ab") as f:
+            f.truncate(capacity * _ROW_BYTES)
+
+    _matrix = np.memmap(_MATRIX_PATH, dtype = np.float16, mode = "r+", shape = (capacity, EMBEDDING_DIM))
+    return _matrix
+
+def lookup_rows(arxiv_ids: list[str]) -> dict[str, tuple[int, int]]:
+    """lookup_rows(arxiv_ids) returns {arxiv_id: (row, n_rows)} for the papers already in the store."""
+    if not arxiv_ids:
+        return {}
+    placeholders = ",".join("?" * len(arxiv_ids))
+    with _lock:
+        found = _index.execute(
+            f"SELECT arxiv_id, row, n_rows FROM papers WHERE arxiv_id IN ({placeholders})", arxiv_ids
+        ).fetchall()
+    return {arxiv_id: (row, n_rows) for arxiv_id, row, n_rows in found}
+
+def load_rows(rows: list[int]) -> np.ndarray:
+    """load_rows(rows) gathers the given rows of the store into a float32 matrix."""
+    if not rows:
+        return np.empty((0, EMBEDDING_DIM), dtype = np.float32)
+    with _lock:
+        matrix = _map_matrix(max(rows) + 1)
+        return matrix[np.asarray(rows)].astype(np.float32)
+
+def append_rows(arxiv_id: str, embs: np.ndarray) -> None:
+    """
+    append_rows(arxiv_id, embs) appends a paper's embedding rows to the end of the store.
+    Row allocation happens inside an immediate SQLite transaction, so concurrent
+    writers (threads or worker processes) never receive overlapping rows.
+    """
+    embs = np.atleast_2d(embs)
+    with _lock:
+        _index.execute("BEGIN IMMEDIATE")
+        try:
+            if _index.execute("SELECT 1 FROM papers WHERE arxiv_id = ?", (arxiv_id,)).fetchone():
+                _index.execute("ROLLBACK")
+                return
+            (next_row,) = _index.execute("SELECT COALESCE(MAX(row + n_rows), 0) FROM papers").fetchone()
+            matrix = _map_matrix(next_row + len(embs))
+            matrix[next_row:next_row + len(embs)] = embs.astype(np.float16)
+            matrix.flush()
+            _index.execute(
+                "INSERT INTO papers (arxiv_id, row, n_rows) VALUES (?, ?, ?)", (arxiv_id, next_row, len(embs))
+            )
+            _index.execute("COMMIT")
+        except Exception:
+            _index.execute("ROLLBACK")
+            raise
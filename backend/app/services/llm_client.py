@@ -21,35 +21,37 @@ This module does NOT:
 All inputs to this module are assumed to be preprocessed and
 retrieved by earlier stages in the pipeline.
 
+Every prompt is split into a static SYSTEM_* instruction block, sent first and
+byte-identical across calls so OpenAI's prompt cache can reuse it, and a user
+message that carries the dynamic content (query, abstract, chunks, paper text) last.
+
 Functions in this program:
 - extract_basic_info
-- rerank_chunks
+- extract_basic_info_mapreduce
+- submit_extract_batch
+- rerank_and_clean
 - score_abstract_relevance
 - clean_chunks
 - expand_query
 - extract_keywords
 - answer_from_chunks
+- stream_answer_from_chunks
 """
 
-import json
+import asyncio
+import functools
+from collections.abc import AsyncIterator
 import re
-from openai import OpenAI
-from app.config import OPENAI_MODEL
+import orjson
+import tiktoken
+from app.config import (
+    OPENAI_MODEL, BATCH_POLL_INTERVAL, EXTRACT_TOKEN_BUDGET, EXTRACT_TAIL_TOKENS,
+    EXTRACT_WINDOW_TOKENS, EXTRACT_WINDOW_OVERLAP, EXTRACT_MAX_WINDOWS,
+)
 from app.schemas import PaperExtraction
+from app.services._openai import client, interactive_client, retry_transient, OPENAI_CALL_TIMEOUT
 
-client = OpenAI()
-
-# 
-def extract_basic_info(text: str) -> dict:
-    """
-    extract_basic_info(text) extracts metadata from a research paper using an LLM.
-    This function prompts an LLM to identify and extract core
-    informational fields such as the paper's task, methodology,
-    application domain, etc.
-    The returned information is intended to provide a lightweight,
-    human-readable overview of the paper.
-    """
-    prompt = f"""
+SYSTEM_EXTRACT_BASIC_INFO = """
         You are analyzing the text of a machine learning research paper.
 
         Your goal is to extract structured, high-level information that helps a researcher
@@ -80,7 +82,7 @@ def extract_basic_info(text: str) -> dict:
         - No markdown, no explanation text.
 
         JSON format:
-        {{
+        {
         "title": string | null,
         "problem_statement": string | null,
         "task_type": string | null,
@@ -93,28 +95,273 @@ def extract_basic_info(text: str) -> dict:
         "key_results": string | null,
         "limitations": string | null,
         "application_domains": list[string]
-        }}
+        }
 
-        Paper text:
-        {text[:30000]}
+        The paper text is given in the user message.
         """
-    response = client.chat.completions.create(
-        model = OPENAI_MODEL,
-        messages = [{"role": "user", "content": prompt}],
-        temperature = 0.0
-    )
 
-    raw_content = response.choices[0].message.content or ""
+# Deletion-only cleanup rules shared by rerank_and_clean and clean_chunks
+_CLEANING_RULES = """
+        - Keep original sentences EXACTLY as written.
+        - Preserve original sentence order.
+        - Remove only:
+        • Figure or table captions
+        • Inline citation markers like [1], (Smith et al., 2020)
+        • Page numbers or headers/footers
+        • Raw equations or equation fragments
+        • Isolated numeric/table fragments
+        • Author affiliations or metadata
+        • Broken sentence fragments
+        - Do NOT summarize.
+        - Do NOT paraphrase.
+        - Do NOT rewrite sentences.
+        - Do NOT merge sentences.
+        - Do NOT add new text.
+        - If a chunk contains no meaningful prose, use an empty string."""
+
+SYSTEM_RERANK_AND_CLEAN = """You are a research paper relevance judge and text cleaner.
+        The user message gives a search query followed by raw PDF-extracted text chunks
+        from a research paper, each labeled with an index.
+
+        Task 1: Pick the 5 chunks that are most relevant to the user's query. No ranking needed, just the 5 best.
+        Task 2: Clean each of the 5 picked chunks. This is PURELY DELETION-BASED CLEANING.""" + _CLEANING_RULES + """
+
+        Return a JSON object of the form {"selected": [5 indices], "cleaned": [5 strings]}
+        where cleaned[i] is the cleaned text of chunk selected[i].
+        Output ONLY the JSON object."""
+
+SYSTEM_SCORE_ABSTRACT = """You are a research relevance judge.
+        The user message gives what a researcher is looking for and a paper's abstract.
+        Rate how relevant this paper is to the researcher's interest on a scale of 0 to 100.
+        0   = Completely unrelated topic or domain.
+        25  = Same general field (e.g. ML) but no shared task, methods, or application.
+        50  = Shares either task OR application domain, but not both. Limited practical usefulness.
+        75  = Shares task or methodology AND application domain. Likely useful background or baseline.
+        100 = Direct match in task, methodology, and application domain. Highly likely to influence the research.
+        Consider topical overlap, methodology relevance, and practical usefulness.
+        Do not consider writing quality or paper importance. Judge relevance only.
+        Return ONLY a JSON object of the form {"score": integer between 0 and 100}. Nothing else.
+        """
+
+SYSTEM_EXPAND_QUERY = """You are a search query expansion assistant for academic research papers.
+    Given the user's research query, expand it by adding related technical synonyms,
+    alternative phrasings, and task clarifications. Do NOT change the user's intent.
+    Rules:
+    - Add relevant technical terms, acronyms, and synonyms that a paper might use.
+    - Do not add unrelated topics.
+    - Return ONLY the expanded query text, nothing else."""
+
+SYSTEM_EXTRACT_KEYWORDS = """You are a keyword extraction assistant for academic paper search.
+    Given the user's research query, extract the 3-5 most important search keywords
+    or short phrases that would find relevant papers on arXiv.
+    Rules:
+    - Focus on technical terms, methods, and domain-specific vocabulary.
+    - Return ONLY the keywords separated by spaces, nothing else.
+    - Do not include filler words like "using", "for", "with", etc."""
+
+SYSTEM_ANSWER = """You are a research paper assistant. A user is asking a question about a specific paper.
+    Answer the user's question using ONLY the provided paper excerpts.
+    If the excerpts don't contain enough information to answer, say so honestly.
+    Be concise, specific, and cite which excerpt(s) your answer draws from when relevant."""
+
+SYSTEM_CLEAN = """
+        You are performing strict text cleanup on raw PDF-extracted research text.
+        The user message gives numbered chunks.
+        Your task is PURELY DELETION-BASED CLEANING.
+        For each chunk:""" + _CLEANING_RULES + """
+
+        Return a JSON object of the form {"cleaned": [strings]} with one element per chunk.
+        Each element must correspond to the cleaned version of the same index.
+        Output ONLY the JSON object.
+        """
+
+_NULLABLE_STRING = {"type": ["string", "null"]}
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+# Structured-output schemas: the model is constrained to emit exactly these JSON objects
+EXTRACT_BASIC_INFO_SCHEMA = {
+    "title": _NULLABLE_STRING,
+    "problem_statement": _NULLABLE_STRING,
+    "task_type": _NULLABLE_STRING,
+    "core_contribution": _NULLABLE_STRING,
+    "model_architecture": _NULLABLE_STRING,
+    "training_details": _NULLABLE_STRING,
+    "datasets": _STRING_LIST,
+    "evaluation_metrics": _STRING_LIST,
+    "baselines": _STRING_LIST,
+    "key_results": _NULLABLE_STRING,
+    "limitations": _NULLABLE_STRING,
+    "application_domains": _STRING_LIST,
+}
+RERANK_AND_CLEAN_SCHEMA = {
+    "selected": {"type": "array", "items": {"type": "integer"}},
+    "cleaned": _STRING_LIST,
+}
+SCORE_ABSTRACT_SCHEMA = {"score": {"type": "integer", "minimum": 0, "maximum": 100}}
+CLEAN_SCHEMA = {"cleaned": _STRING_LIST}
+
+def _json_schema(name: str, properties: dict) -> dict:
+    """_json_schema(name, properties) builds a strict json_schema response_format with every property required."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+@retry_transient
+async def _chat(**request):
+    """
+    _chat(**request) sends a chat completion request on the request path, retrying transient
+    failures (including 429s from calls fanned out per paper) with jittered backoff.
+    With stream = True only opening the stream is retried.
+    """
+    return await interactive_client.chat.completions.create(**request)
+
+# PDF hyphenation patterns applied to every chunk before cleaning, compiled once at import
+_HYPHEN_NL = re.compile(r'-\s*\n\s*')
+_HYPHEN_WS = re.compile(r'(\w)-\s+(\w)')
+
+@functools.cache
+def _encoding() -> tiktoken.Encoding:
+    """_encoding() loads OPENAI_MODEL's tokenizer once, on first use (tiktoken may need to download it)."""
+    return tiktoken.encoding_for_model(OPENAI_MODEL)
+
+def _fit_token_budget(text: str, budget: int, tail: int) -> str:
+    """
+    _fit_token_budget(text, budget, tail) trims text to at most budget tokens.
+    Longer texts keep their first budget - tail tokens and their last tail tokens.
+    """
+    encoding = _encoding()
+    ids = encoding.encode(text, disallowed_special = ())
+    if len(ids) <= budget:
+        return text
+    return encoding.decode(ids[:budget - tail]) + "\n...\n" + encoding.decode(ids[-tail:])
+
+def _messages(system: str, user: str) -> list[dict]:
+    """_messages(system, user) builds the chat messages: static instructions first, dynamic content last."""
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+def _join_hyphenation(chunks: list[str]) -> list[str]:
+    """_join_hyphenation(chunks) rejoins words split by hyphenated line breaks in PDF text."""
+    # Rejoin hyphenated line breaks
+    chunks = [_HYPHEN_NL.sub('', c) for c in chunks]
+    # Also catch hyphen followed by whitespace mid-word
+    return [_HYPHEN_WS.sub(r'\1\2', c) for c in chunks]
+
+#
+async def extract_basic_info(text: str) -> PaperExtraction:
+    """
+    extract_basic_info(text) extracts metadata from a research paper using an LLM.
+    This function prompts an LLM to identify and extract core
+    informational fields such as the paper's task, methodology,
+    application domain, etc.
+    The returned information is intended to provide a lightweight,
+    human-readable overview of the paper.
+    """
+    # Tokenizing a full paper is CPU-bound, keep it off the event loop
+    return await _extract(await asyncio.to_thread(_extract_request, text))
+
+
+async def _extract(request: dict) -> PaperExtraction:
+    """_extract(request) sends an extraction request body and parses the LLM's answer."""
+    response = await client.chat.completions.create(**request)
+    return _parse_extraction(response.choices[0].message.content or "")
 
-    # Strip markdown fences if the LLM wraps its response
-    cleaned = raw_content.strip()
-    if cleaned.startswith("```"):
-        cleaned = re.sub(r'^```(?:json)?\s*', '', cleaned)
-        cleaned = re.sub(r'\s*```$', '', cleaned)
 
+# Placeholders SYSTEM_EXTRACT_BASIC_INFO asks for when a field is not stated in the text
+_NOT_STATED = {"Not explicitly stated.", "Not discussed by the authors."}
+
+def _token_windows(text: str) -> list[str]:
+    """
+    _token_windows(text) splits a paper longer than EXTRACT_TOKEN_BUDGET into evenly sized windows
+    of at most EXTRACT_WINDOW_TOKENS tokens that overlap by EXTRACT_WINDOW_OVERLAP tokens.
+    Papers too long for EXTRACT_MAX_WINDOWS such windows are first trimmed to fit them, keeping
+    their head and their last EXTRACT_TAIL_TOKENS tokens (as _fit_token_budget does).
+    Shorter papers come back as a single window. Every window is meant to be sent whole.
+    """
+    encoding = _encoding()
+    ids = encoding.encode(text, disallowed_special = ())
+    if len(ids) <= EXTRACT_TOKEN_BUDGET:
+        return [text]
+    stride = EXTRACT_WINDOW_TOKENS - EXTRACT_WINDOW_OVERLAP
+    limit = EXTRACT_MAX_WINDOWS * stride + EXTRACT_WINDOW_OVERLAP
+    if len(ids) > limit:
+        gap = encoding.encode("\n...\n")
+        ids = ids[:limit - EXTRACT_TAIL_TOKENS - len(gap)] + gap + ids[-EXTRACT_TAIL_TOKENS:]
+    span = len(ids) - EXTRACT_WINDOW_OVERLAP
+    count = -(-span // stride)
+    step = -(-span // count)
+    return [encoding.decode(ids[i * step:(i + 1) * step + EXTRACT_WINDOW_OVERLAP]) for i in range(count)]
+
+def _merge_extractions(partials: list[PaperExtraction]) -> PaperExtraction:
+    """
+    _merge_extractions(partials) merges per-window extractions, given in paper order.
+    Text fields take the first value actually stated (placeholders only if no window states one);
+    list fields take the union of all windows, in order, ignoring case.
+    """
+    merged = {}
+    for name in PaperExtraction.model_fields:
+        values = [getattr(p, name) for p in partials]
+        if isinstance(values[0], list):
+            union = {}
+            for value in values:
+                for item in value:
+                    union.setdefault(item.strip().lower(), item)
+            merged[name] = list(union.values())
+        else:
+            present = [v for v in values if v]
+            stated = [v for v in present if v.strip() not in _NOT_STATED]
+            merged[name] = (stated or present or [None])[0]
+    return PaperExtraction(**merged)
+
+
+async def extract_basic_info_mapreduce(text: str) -> PaperExtraction:
+    """
+    extract_basic_info_mapreduce(text) is extract_basic_info over far more of a long paper: all of it,
+    up to EXTRACT_MAX_WINDOWS windows (see _token_windows). The text is split into overlapping token
+    windows that are extracted concurrently, each sent whole, and the partial extractions are merged field by field. Papers within
+    EXTRACT_TOKEN_BUDGET are a single window, extracted in one call.
+    """
+    # Tokenizing a full paper is CPU-bound, keep it off the event loop
+    windows = await asyncio.to_thread(_token_windows, text)
+    partials = await asyncio.gather(*(_extract(_window_request(window)) for window in windows))
+    return partials[0] if len(partials) == 1 else _merge_extractions(partials)
+
+
+def _extract_request(text: str) -> dict:
+    """
+    _extract_request(text) builds the chat completion body for extract_basic_info, also used in batch jobs.
+    The paper text is trimmed to EXTRACT_TOKEN_BUDGET tokens (head and tail).
+    """
+    return _window_request(_fit_token_budget(text, EXTRACT_TOKEN_BUDGET, EXTRACT_TAIL_TOKENS))
+
+
+def _window_request(text: str) -> dict:
+    """_window_request(text) builds the extraction request body for text sent as is (a _token_windows window)."""
+    return {
+        "model": OPENAI_MODEL,
+        "messages": _messages(SYSTEM_EXTRACT_BASIC_INFO, f"Paper text:\n{text}"),
+        "temperature": 0.0,
+        "response_format": _json_schema("paper_extraction", EXTRACT_BASIC_INFO_SCHEMA),
+    }
+
+
+def _parse_extraction(raw_content: str) -> PaperExtraction:
+    """_parse_extraction(raw_content) validates the LLM's JSON output as a PaperExtraction."""
     try:
-        data = json.loads(cleaned)
-    except json.JSONDecodeError as e:
+        data = orjson.loads(raw_content)
+    except orjson.JSONDecodeError as e:
         raise ValueError(f"LLM returned invalid JSON: {e}\nRaw response: {raw_content[:500]}")
 
     try:
@@ -125,133 +372,158 @@ def extract_basic_info(text: str) -> dict:
     return paper
 
 
-def rerank_chunks(query: str, chunks: list[dict]) -> list[int]:
+async def submit_extract_batch(papers: dict[str, str]) -> dict[str, PaperExtraction]:
     """
-    rerank_chunks(query, chunks) reranks candidate text chunks using an LLM-based relevance judgment.
-    Given a user query and a list of candidate chunks (each with 'index' and 'text'),
-    the LLM to pick the 5 most relevant chunks.
-    Returns a list of indices into the input chunks list.
+    submit_extract_batch(papers) runs extract_basic_info over many papers (arxiv_id -> text)
+    through the OpenAI Batch API, for non-interactive bulk ingestion such as an arXiv crawl.
+    Batch jobs cost half as much and draw on a separate rate-limit pool, but may take up to 24h,
+    so user-triggered extraction keeps using extract_basic_info.
+    Polls every BATCH_POLL_INTERVAL seconds until the job finishes.
+    Returns the extractions that succeeded, keyed by arxiv_id; failed rows are left out.
     """
-    numbered_chunks = "\n".join(
-        f"[{i}] {c['text']}" for i, c in enumerate(chunks)
+    if not papers:
+        return {}
+
+    lines = [
+        orjson.dumps({
+            "custom_id": arxiv_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": _extract_request(text),
+        })
+        for arxiv_id, text in papers.items()
+    ]
+    input_file = await client.files.create(file = ("extract_batch.jsonl", b"\n".join(lines)), purpose = "batch")
+    batch = await client.batches.create(
+        input_file_id = input_file.id,
+        endpoint = "/v1/chat/completions",
+        completion_window = "24h",
     )
 
-    prompt = f"""You are a research paper relevance judge.
-        A user is searching for: "{query}"
-        Below are {len(chunks)} text chunks from a research paper, each labeled with an index.
-        {numbered_chunks}
-        Pick the 5 chunks that are most relevant to the user's query.
-        Return ONLY a JSON array of their indices. No ranking needed, just the 5 best.
-        Output ONLY the JSON array, nothing else."""
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(BATCH_POLL_INTERVAL)
+        batch = await client.batches.retrieve(batch.id)
+
+    if batch.status != "completed" or batch.output_file_id is None:
+        raise RuntimeError(f"Extraction batch {batch.id} ended with status {batch.status}")
+
+    output = await client.files.content(batch.output_file_id)
+    results = {}
+    for line in output.content.splitlines():
+        if not line.strip():
+            continue
+        row = orjson.loads(line)
+        response = row.get("response") or {}
+        if response.get("status_code") != 200:
+            continue
+        try:
+            content = response["body"]["choices"][0]["message"]["content"] or ""
+            results[row["custom_id"]] = _parse_extraction(content)
+        except (KeyError, IndexError, ValueError):
+            continue
+    return results
+
+
+async def rerank_and_clean(query: str, chunks: list[dict]) -> tuple[list[int], list[str]]:
+    """
+    rerank_and_clean(query, chunks) reranks and cleans candidate chunks in a single LLM call.
+    Given a user query and a list of candidate chunks (each with 'index' and 'text'),
+    the LLM picks the 5 most relevant chunks and returns a noise-free version of each.
+    Returns (indices into the input chunks list, cleaned text of those chunks), in the same order.
+    """
+    texts = _join_hyphenation([c["text"] for c in chunks])
+    numbered_chunks = "\n\n".join(
+        f"[{i}]\n{text}" for i, text in enumerate(texts)
+    )
+    user = f'A user is searching for: "{query}"\nHere are {len(chunks)} chunks:\n{numbered_chunks}'
 
-    response = client.chat.completions.create(
+    response = await _chat(
         model = OPENAI_MODEL,
-        messages = [{"role": "user", "content": prompt}],
+        messages = _messages(SYSTEM_RERANK_AND_CLEAN, user),
         temperature = 0.0,
+        response_format = _json_schema("rerank_and_clean", RERANK_AND_CLEAN_SCHEMA),
     )
 
-    raw = response.choices[0].message.content.strip()
+    raw = response.choices[0].message.content or ""
 
     try:
-        indices = json.loads(raw)
-    except json.JSONDecodeError:
-        return list(range(min(5, len(chunks)))) # Fallback (return first 5)
-
-    # Validate indices are in range
-    valid = [i for i in indices if isinstance(i, int) and 0 <= i < len(chunks)]
-    if len(valid) < 5:
-        # Fill with remaining top indices not already selected
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        data = {}
+    selected = data.get("selected") if isinstance(data, dict) else None
+    cleaned = data.get("cleaned") if isinstance(data, dict) else None
+    if not isinstance(selected, list):
+        selected = []
+    if not isinstance(cleaned, list) or len(cleaned) != len(selected):
+        cleaned = [None] * len(selected)
+
+    # Keep valid, distinct indices along with their cleaned text
+    cleaned_by_index = {}
+    for i, text in zip(selected, cleaned):
+        if isinstance(i, int) and 0 <= i < len(chunks) and i not in cleaned_by_index:
+            cleaned_by_index[i] = str(text) if text is not None else texts[i]
+    if len(cleaned_by_index) < 5:
+        # Fill with remaining top indices not already selected, left uncleaned
         for i in range(len(chunks)):
-            if i not in valid:
-                valid.append(i)
-            if len(valid) >= 5:
+            if len(cleaned_by_index) >= 5:
                 break
+            cleaned_by_index.setdefault(i, texts[i])
 
-    return valid[:5]
+    indices = list(cleaned_by_index)[:5]
+    return indices, [cleaned_by_index[i] for i in indices]
 
 
-def score_abstract_relevance(query: str, abstract: str) -> float:
+async def score_abstract_relevance(query: str, abstract: str) -> float:
     """score_abstract_relevance asks the LLM to rate how relevant an abstract is to the user's query (0–100)."""
-    prompt = f"""You are a research relevance judge.
-        A researcher is looking for: "{query}"
-        Here is a paper's abstract:
-        "{abstract}"
-        Rate how relevant this paper is to the researcher's interest on a scale of 0 to 100.
-        0   = Completely unrelated topic or domain.
-        25  = Same general field (e.g. ML) but no shared task, methods, or application.
-        50  = Shares either task OR application domain, but not both. Limited practical usefulness.
-        75  = Shares task or methodology AND application domain. Likely useful background or baseline.
-        100 = Direct match in task, methodology, and application domain. Highly likely to influence the research.
-        Consider topical overlap, methodology relevance, and practical usefulness.
-        Do not consider writing quality or paper importance. Judge relevance only.
-        Return ONLY a single integer between 0 and 100. Nothing else.
-        """
+    user = f'A researcher is looking for: "{query}"\nHere is a paper\'s abstract:\n"{abstract}"'
 
-    response = client.chat.completions.create(
+    response = await _chat(
         model = OPENAI_MODEL,
-        messages = [{"role": "user", "content": prompt}],
+        messages = _messages(SYSTEM_SCORE_ABSTRACT, user),
         temperature = 0.0,
+        timeout = OPENAI_CALL_TIMEOUT,
+        response_format = _json_schema("abstract_relevance", SCORE_ABSTRACT_SCHEMA),
     )
 
-    raw = response.choices[0].message.content.strip()
+    raw = response.choices[0].message.content or ""
 
     try:
-        score = int(raw)
-        return float(max(0, min(100, score)))
-    except ValueError:
-        # Try to extract a number from the response
-        match = re.search(r'\d+', raw)
-        if match:
-            return float(max(0, min(100, int(match.group()))))
+        score = int(orjson.loads(raw)["score"])
+    except (orjson.JSONDecodeError, KeyError, TypeError, ValueError):
         return 50.0
+    return float(max(0, min(100, score)))
 
 
-def expand_query(query: str) -> str:
+async def expand_query(query: str) -> str:
     """
     expand_query(query) uses an LLM to enrich the user's search query with
     related technical synonyms and task clarifications to improve retrieval recall.
     The original intent of the query is preserved.
     """
-    prompt = f"""You are a search query expansion assistant for academic research papers.
-    Given the user's research query, expand it by adding related technical synonyms,
-    alternative phrasings, and task clarifications. Do NOT change the user's intent.
-    Rules:
-    - Add relevant technical terms, acronyms, and synonyms that a paper might use.
-    - Do not add unrelated topics.
-    - Return ONLY the expanded query text, nothing else.
-    User query: "{query}"
-    Expanded query:"""
     try:
-        response = client.chat.completions.create(
+        response = await _chat(
             model = OPENAI_MODEL,
-            messages = [{"role": "user", "content": prompt}],
+            messages = _messages(SYSTEM_EXPAND_QUERY, f'User query: "{query}"\nExpanded query:'),
             temperature = 0.0,
+            timeout = OPENAI_CALL_TIMEOUT,
         )
         expanded = response.choices[0].message.content.strip()
         return expanded if expanded else query
     except Exception:
         return query
 
-def extract_keywords(query: str) -> str:
+async def extract_keywords(query: str) -> str:
     """
     extract_keywords(query) uses an LLM to extract the most important
     search keywords from the user's query for arXiv API search.
     Returns a space-separated keyword string.
     """
-    prompt = f"""You are a keyword extraction assistant for academic paper search.
-    Given the user's research query, extract the 3-5 most important search keywords
-    or short phrases that would find relevant papers on arXiv.
-    Rules:
-    - Focus on technical terms, methods, and domain-specific vocabulary.
-    - Return ONLY the keywords separated by spaces, nothing else.
-    - Do not include filler words like "using", "for", "with", etc.
-    User query: "{query}"
-    Keywords:"""
     try:
-        response = client.chat.completions.create(
+        response = await _chat(
             model = OPENAI_MODEL,
-            messages = [{"role": "user", "content": prompt}],
+            messages = _messages(SYSTEM_EXTRACT_KEYWORDS, f'User query: "{query}"\nKeywords:'),
             temperature = 0.0,
+            timeout = OPENAI_CALL_TIMEOUT,
         )
         keywords = response.choices[0].message.content.strip()
         return keywords if keywords else query
@@ -259,27 +531,23 @@ def extract_keywords(query: str) -> str:
         return query
 
 
-def answer_from_chunks(query: str, chunks: list[str]) -> str:
-    """
-    answer_from_chunks(query, chunks) uses an LLM to answer the user's question
-    based on the most relevant paper excerpts retrieved by cosine similarity.
-    """
+def _answer_prompt(query: str, chunks: list[str]) -> str:
+    """_answer_prompt(query, chunks) builds the user message of answer_from_chunks: the question and numbered excerpts."""
     numbered = "\n\n".join(
         f"[Excerpt {i+1}]\n{chunk}" for i, chunk in enumerate(chunks)
     )
+    return f'User question: "{query}"\nPaper excerpts:\n{numbered}\nAnswer:'
 
-    prompt = f"""You are a research paper assistant. A user is asking a question about a specific paper.
-    Answer the user's question using ONLY the provided paper excerpts below.
-    If the excerpts don't contain enough information to answer, say so honestly.
-    Be concise, specific, and cite which excerpt(s) your answer draws from when relevant.
-    User question: "{query}"
-    Paper excerpts:
-    {numbered}
-    Answer:"""
+
+async def answer_from_chunks(query: str, chunks: list[str]) -> str:
+    """
+    answer_from_chunks(query, chunks) uses an LLM to answer the user's question
+    based on the most relevant paper excerpts retrieved by cosine similarity.
+    """
     try:
-        response = client.chat.completions.create(
+        response = await _chat(
             model = OPENAI_MODEL,
-            messages = [{"role": "user", "content": prompt}],
+            messages = _messages(SYSTEM_ANSWER, _answer_prompt(query, chunks)),
             temperature = 0.0,
         )
         answer = response.choices[0].message.content.strip()
@@ -288,59 +556,45 @@ def answer_from_chunks(query: str, chunks: list[str]) -> str:
         return f"Error generating answer: {str(e)}"
 
 
-def clean_chunks(chunks: list[str]) -> list[str]:
+async def stream_answer_from_chunks(query: str, chunks: list[str]) -> AsyncIterator[str]:
+    """
+    stream_answer_from_chunks(query, chunks) is answer_from_chunks streamed: it yields the answer
+    text piece by piece as the LLM generates it, so the first words reach the user before the last are decoded.
+    Unlike answer_from_chunks, LLM errors are raised to the caller.
+    """
+    stream = await _chat(
+        model = OPENAI_MODEL,
+        messages = _messages(SYSTEM_ANSWER, _answer_prompt(query, chunks)),
+        temperature = 0.0,
+        stream = True,
+    )
+    async for event in stream:
+        if event.choices and event.choices[0].delta.content:
+            yield event.choices[0].delta.content
+
+
+async def clean_chunks(chunks: list[str]) -> list[str]:
     """
     clean_chunks post-processes the top 5 chunks with an LLM to remove noise
     (figure captions, table fragments, equations, page headers, etc.)
     and return only the meaningful, readable content from each chunk.
     """
-    # Rejoin hyphenated line breaks
-    chunks = [re.sub(r'-\s*\n\s*', '', c) for c in chunks]
-    # Also catch hyphen followed by whitespace mid-word
-    chunks = [re.sub(r'(\w)-\s+(\w)', r'\1\2', c) for c in chunks]
+    chunks = _join_hyphenation(chunks)
     numbered = "\n\n".join(
         f"[{i}]\n{chunk}" for i, chunk in enumerate(chunks)
     )
-    prompt = f"""
-        You are performing strict text cleanup on raw PDF-extracted research text.
-        You will receive {len(chunks)} numbered chunks.
-        Your task is PURELY DELETION-BASED CLEANING.
-        For each chunk:
-        - Keep original sentences EXACTLY as written.
-        - Preserve original sentence order.
-        - Remove only:
-        • Figure or table captions
-        • Inline citation markers like [1], (Smith et al., 2020)
-        • Page numbers or headers/footers
-        • Raw equations or equation fragments
-        • Isolated numeric/table fragments
-        • Author affiliations or metadata
-        • Broken sentence fragments
-        Rules:
-        - Do NOT summarize.
-        - Do NOT paraphrase.
-        - Do NOT rewrite sentences.
-        - Do NOT merge sentences.
-        - Do NOT add new text.
-        - If a chunk contains no meaningful prose, return an empty string.
-
-        Return a JSON array of length {len(chunks)}.
-        Each element must correspond to the cleaned version of the same index.
-        Output ONLY the JSON array.
-
-        Here are the chunks:
-        {numbered}
-        """
-    response = client.chat.completions.create(
+    user = f"Here are the {len(chunks)} chunks:\n{numbered}"
+    response = await _chat(
         model = OPENAI_MODEL,
-        messages = [{"role": "user", "content": prompt}],
+        messages = _messages(SYSTEM_CLEAN, user),
         temperature = 0.0,
+        response_format = _json_schema("clean_chunks", CLEAN_SCHEMA),
     )
-    raw = response.choices[0].message.content.strip()
+    raw = response.choices[0].message.content or ""
     try:
-        cleaned = json.loads(raw)
+        cleaned = orjson.loads(raw).get("cleaned")
         if isinstance(cleaned, list) and len(cleaned) == len(chunks):
             return [str(c) for c in cleaned]
-    except json.JSONDecodeError:
+    except (orjson.JSONDecodeError, AttributeError):
         pass
     return chunks
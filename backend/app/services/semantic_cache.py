@@ -0,0 +1,94 @@
+"""
+semantic_cache.py
+Semantic cache of LLM results, stored in the on-disk cache shared with embed_cache.
+This module is responsible for:
+- Reusing an LLM result when a new query is a near-paraphrase of an earlier query
+  asked in the same scope (e.g. on the same paper or against the same abstract)
+- Persisting those results so they survive restarts and are shared by every worker process
+
+Each scope's entry holds the unit-normalized float16 embeddings of its earlier queries
+and, in the same order, their results. A lookup is a single matrix-vector product against
+that entry: a scope only ever holds a few dozen queries, so an exact brute-force scan
+is cheaper than maintaining a vector index. Entries expire after SEMANTIC_CACHE_TTL seconds.
+
+Functions in this program:
+- SemanticCache
+- semantic_cached
+"""
+
+import functools
+import hashlib
+import numpy as np
+from app.config import OPENAI_EMBEDDING_MODEL, SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_MAX_QUERIES
+from app.services.embed_cache import cache
+
+def _normalize(emb: np.ndarray) -> np.ndarray:
+    """_normalize(emb) returns emb scaled to unit length (unchanged if it is all zeros)."""
+    emb = np.asarray(emb, dtype = np.float32)
+    return emb / (np.linalg.norm(emb) or 1.0)
+
+class SemanticCache:
+    """
+    SemanticCache(name, threshold) maps (scope, query embedding) -> result.
+    A lookup hits when an earlier query in the same scope has cosine similarity >= threshold
+    with the new one. Each scope keeps its max_queries most recent queries.
+    """
+
+    def __init__(self, name: str, threshold: float, max_queries: int = SEMANTIC_CACHE_MAX_QUERIES, ttl: int = SEMANTIC_CACHE_TTL):
+        self.name = name
+        self.threshold = threshold
+        self.max_queries = max_queries
+        self.ttl = ttl
+
+    def _key(self, scope: str) -> str:
+        """_key(scope) builds the cache key of a scope; embeddings from different models are kept apart."""
+        digest = hashlib.blake2b(scope.encode("utf-8", "surrogatepass"), digest_size = 16).hexdigest()
+        return f"semantic:{self.name}:{OPENAI_EMBEDDING_MODEL}:{digest}"
+
+    def lookup(self, scope: str, query_emb: np.ndarray):
+        """lookup(scope, query_emb) returns the result of the most similar earlier query in scope, or None."""
+        entry = cache.get(self._key(scope))
+        if entry is None:
+            return None
+        query_embs, results = entry
+        sims = query_embs.astype(np.float32) @ _normalize(query_emb)
+        best = int(np.argmax(sims))
+        return results[best] if sims[best] >= self.threshold else None
+
+    def store(self, scope: str, query_emb: np.ndarray, result) -> None:
+        """store(scope, query_emb, result) adds a query's result to the scope, dropping the oldest beyond max_queries."""
+        key = self._key(scope)
+        query_emb = _normalize(query_emb)
+        query_embs, results = cache.get(key, (np.empty((0, len(query_emb)), dtype = np.float16), []))
+        cache.set(
+            key,
+            (
+                np.vstack([query_embs, query_emb.astype(np.float16)])[-self.max_queries:],
+                (results + [result])[-self.max_queries:],
+            ),
+            expire = self.ttl,
+        )
+
+def semantic_cached(name: str, threshold: float, embed):
+    """
+    semantic_cached(name, threshold, embed) decorates an async fn(query, *context) so that its result
+    is reused for any query within threshold cosine similarity of an earlier one with the same context.
+    embed(texts) must return an embedding matrix; the context arguments are hashed into the scope.
+    Callers that have already embedded the query pass it as query_emb to skip the embed call.
+    """
+    semantic_cache = SemanticCache(name, threshold)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(query: str, *context, query_emb: np.ndarray | None = None):
+            scope = repr(context)
+            if query_emb is None:
+                query_emb = (await embed([query]))[0]
+            cached = semantic_cache.lookup(scope, query_emb)
+            if cached is not None:
+                return cached
+            result = await fn(query, *context)
+            semantic_cache.store(scope, query_emb, result)
+            return result
+        return wrapper
+    return decorator
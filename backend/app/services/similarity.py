@@ -9,89 +9,249 @@ This module is responsible for:
 - Providing a fast, deterministic retrieval step prior to LLM-based reranking
 """
 
+import asyncio
+import functools
 import numpy as np
-from openai import OpenAI
-from app.config import OPENAI_EMBEDDING_MODEL
+import tiktoken
+from app.config import (
+    OPENAI_EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_REQUEST_TOKENS, EMBEDDING_MAX_INPUT_TOKENS, EMBEDDING_DIM, EMBEDDING_FALLBACK_CONCURRENCY, MAX_CONCURRENT_LLM_CALLS,
+    ENABLE_LLM_RERANK_SHORTCIRCUIT, RERANK_SHORTCIRCUIT_GAP, RERANK_SHORTCIRCUIT_MIN_SCORE,
+    ABSTRACT_SCORE_CACHE_SIMILARITY, SCORING_THREAD_MIN_ROWS,
+)
 from app.schemas import ChunkScore, SimilarityResult, RelatedPaper, RelatedPapersResult
-from app.services.llm_client import rerank_chunks, clean_chunks, score_abstract_relevance
+from app.services.llm_client import rerank_and_clean, clean_chunks
+from app.services.llm_client import score_abstract_relevance as _llm_score_abstract_relevance
+from app.services.embed_cache import get_cached_embeddings, store_embeddings
+from app.services.embed_store import lookup_rows, load_rows, append_rows
+from app.services.semantic_cache import semantic_cached
+from app.services._openai import interactive_client, retry_transient, OPENAI_CALL_TIMEOUT
 
-client = OpenAI()
+@retry_transient
+async def _create_embeddings(texts: list[str]):
+    """_create_embeddings(texts) sends one embeddings request, retrying transient failures with jittered backoff."""
+    return await interactive_client.embeddings.create(
+        model = OPENAI_EMBEDDING_MODEL,
+        input = texts,
+        timeout = OPENAI_CALL_TIMEOUT,
+    )
+
+async def _embed_batch(batch: list[str]) -> np.ndarray:
+    """
+    _embed_batch(batch) embeds one batch from _embedding_batches in a single API request.
+    Each returned embedding is written straight into its row of a float32 matrix, by its returned index.
+    If the batched response is missing embeddings, only those texts are re-sent one at a time,
+    at most EMBEDDING_FALLBACK_CONCURRENCY requests in flight.
+    """
+    response = await _create_embeddings(batch)
+    out = np.empty((len(batch), EMBEDDING_DIM), dtype = np.float32)
+    returned = set()
+    for item in response.data:
+        if 0 <= item.index < len(batch):
+            out[item.index] = item.embedding
+            returned.add(item.index)
+    if len(returned) == len(batch):
+        return out
 
-def get_embeddings(texts: list[str]) -> list[list[float]]:
+    semaphore = asyncio.Semaphore(EMBEDDING_FALLBACK_CONCURRENCY)
+
+    async def embed_single(i: int) -> None:
+        async with semaphore:
+            r = await _create_embeddings([batch[i]])
+        out[i] = r.data[0].embedding
+
+    await asyncio.gather(*(embed_single(i) for i in range(len(batch)) if i not in returned))
+    return out
+
+@functools.cache
+def _embedding_encoding() -> tiktoken.Encoding:
+    """_embedding_encoding() loads OPENAI_EMBEDDING_MODEL's tokenizer once, on first use (tiktoken may need to download it)."""
+    return tiktoken.encoding_for_model(OPENAI_EMBEDDING_MODEL)
+
+def _embedding_batches(texts: list[str]) -> list[list[str]]:
+    """
+    _embedding_batches(texts) splits texts, in order, into embeddings requests that stay within both
+    EMBEDDING_BATCH_SIZE inputs and EMBEDDING_MAX_REQUEST_TOKENS tokens.
+    Inputs over EMBEDDING_MAX_INPUT_TOKENS tokens are truncated to that length.
+    """
+    encoding = _embedding_encoding()
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for text, ids in zip(texts, encoding.encode_ordinary_batch(texts)):
+        if len(ids) > EMBEDDING_MAX_INPUT_TOKENS:
+            ids = ids[:EMBEDDING_MAX_INPUT_TOKENS]
+            text = encoding.decode(ids)
+        if batch and (len(batch) == EMBEDDING_BATCH_SIZE or batch_tokens + len(ids) > EMBEDDING_MAX_REQUEST_TOKENS):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(text)
+        batch_tokens += len(ids)
+    if batch:
+        batches.append(batch)
+    return batches
+
+async def get_embeddings(texts: list[str]) -> np.ndarray:
     """
     get_embeddings(texts) computes vector embeddings for a list of text inputs.
     This function encodes each input string into a fixed-length
     numerical vector suitable for semantic similarity comparison.
+    Texts already in the embedding cache are served from memory or disk (as float16,
+    upcast here); only the distinct misses are sent to the API, in as few requests as the
+    input and token limits allow (see _embedding_batches), with the batches issued concurrently.
+    Returns a preallocated float32 matrix of shape (len(texts), EMBEDDING_DIM), one row per text,
+    filled in place from the cache and the API responses.
     The returned embeddings are intended to be used with cosine
     similarity or other distance-based retrieval methods.
     """
-    response = client.embeddings.create(
-        model = OPENAI_EMBEDDING_MODEL,
-        input = texts,
-    )
-    return [item.embedding for item in response.data]
+    out = np.empty((len(texts), EMBEDDING_DIM), dtype = np.float32)
+    misses = []
+    for i, emb in enumerate(get_cached_embeddings(texts)):
+        if emb is None:
+            misses.append(i)
+        else:
+            out[i] = emb
+    if not misses:
+        return out
+
+    # Repeated texts (e.g. boilerplate chunks) are embedded once
+    miss_texts = list(dict.fromkeys(texts[i] for i in misses))
+    # Tokenizing is CPU-bound, keep it off the event loop
+    batches = await asyncio.to_thread(_embedding_batches, miss_texts)
+    results = await asyncio.gather(*(_embed_batch(batch) for batch in batches))
+    fresh = results[0] if len(results) == 1 else np.concatenate(results, axis = 0)
+
+    store_embeddings(miss_texts, fresh)
+    row_of = {text: j for j, text in enumerate(miss_texts)}
+    out[misses] = fresh[[row_of[texts[i]] for i in misses]]
+    return out
+
+# LLM relevance judgments are reused when a paraphrase of an earlier query is scored against the same abstract
+score_abstract_relevance = semantic_cached(
+    "abstract_score", ABSTRACT_SCORE_CACHE_SIMILARITY, embed = get_embeddings,
+)(_llm_score_abstract_relevance)
+
+def score_all(query_emb: np.ndarray, mat: np.ndarray) -> np.ndarray:
+    """
+    score_all(query_emb, mat) computes the cosine similarity between the query
+    and every row of mat (clamped to 0) with a single float32 matrix-vector product.
+    """
+    mat = np.asarray(mat, dtype = np.float32)
+    q_norm = np.linalg.norm(query_emb)
+    if q_norm == 0 or len(mat) == 0:
+        return np.zeros(len(mat), dtype = np.float32)
+    row_norms = np.linalg.norm(mat, axis = 1).clip(min = 1e-12)
+    scores = (mat @ (query_emb / q_norm).astype(np.float32)) / row_norms
+    return np.clip(scores, 0.0, None)
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    _top_k_indices(scores, k) returns the indices of the k highest scores, sorted descending.
+    Uses a partial sort (argpartition) so only the k winners are fully ordered;
+    when every score is wanted (as in rank_papers) the partition step is skipped.
+    """
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype = np.intp)
+    if k == len(scores):
+        return np.argsort(-scores, kind = "stable")
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind = "stable")]
+
+def _dedupe_texts(texts: list[str]) -> tuple[list[str], np.ndarray]:
+    """
+    _dedupe_texts(texts) collapses texts that are equal up to case and whitespace
+    (page headers, boilerplate repeated by the PDF extractor) to their first occurrence.
+    Returns (unique, back): the representative texts and, for each text, the index of its representative,
+    so per-unique results expand back to every text with result[back].
+    """
+    seen = {}
+    unique = []
+    back = np.empty(len(texts), dtype = np.intp)
+    for i, text in enumerate(texts):
+        key = " ".join(text.lower().split())
+        j = seen.get(key)
+        if j is None:
+            j = seen[key] = len(unique)
+            unique.append(text)
+        back[i] = j
+    return unique, back
 
-def cosine_similarity(vec_a: list[float], vec_b: list[float]) -> float:
-    """Compute cosine similarity between two vectors."""
-    a = np.array(vec_a)
-    b = np.array(vec_b)
-    dot = np.dot(a, b)
-    norm = np.linalg.norm(a) * np.linalg.norm(b)
-    if norm == 0:
-        return 0.0
-    score = float(dot / norm)
-    return float(max(0.0, score))
+def topk_cosine(embs: np.ndarray, q: np.ndarray, k: int, back: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    topk_cosine(embs, q, k, back) returns (indices, scores) of the k rows of embs most similar to q,
+    sorted by score descending. This is the per-turn hot path of /paper/chat:
+    the matrix is made C-contiguous float32 once, scored with score_all,
+    and only the k winners are sorted.
+    If embs holds deduplicated rows, back (from _dedupe_texts) expands the scores to the original
+    positions, and the returned indices refer to those.
+    """
+    embs = np.ascontiguousarray(embs, dtype = np.float32)
+    scores = score_all(q, embs)
+    if back is not None:
+        scores = scores[back]
+    idx = _top_k_indices(scores, k)
+    return idx, scores[idx]
 
-def rank_chunks(query: str, abstract: str, chunks: list[str]) -> SimilarityResult:
+async def rank_chunks(query: str, abstract: str, chunks: list[str]) -> SimilarityResult:
     """
     rank_chunks(query, abstract, chunks)
     Two-stage retrieval pipeline:
-    1. Embed query, abstract, and all chunks; compute cosine scores (clamped to 0)
+    1. Embed query, abstract, and all distinct chunks; compute cosine scores (clamped to 0)
     2. Take top 20 chunks by cosine score
-    3. LLM reranks to pick the best 5
-    4. Return full chunk text with its score
+    3. One LLM call reranks to pick the best 5 and cleans their text; when the cosine
+       top 5 is already decisive (see ENABLE_LLM_RERANK_SHORTCIRCUIT) it is kept and only cleaned
+    4. Return cleaned chunk text with its score
     """
-    # Embed everything in one batch call for efficiency
-    all_texts = [query, abstract] + chunks
-    embeddings = get_embeddings(all_texts)
+    async def embed_query_and_score() -> tuple[np.ndarray, float]:
+        # Only the LLM abstract score waits on the query embedding: its cache is looked up with it
+        query_emb = (await get_embeddings([query]))[0]
+        return query_emb, await score_abstract_relevance(query, abstract, query_emb = query_emb)
 
-    query_emb = embeddings[0]
-    abstract_emb = embeddings[1]
-    chunk_embs = embeddings[2:]
+    # Embed the abstract and chunks in one batch call, while the query is embedded and the LLM scores
+    # the abstract; duplicate chunks are embedded and scored once
+    unique_chunks, back = _dedupe_texts(chunks)
+    embeddings, (query_emb, llm_abstract) = await asyncio.gather(
+        get_embeddings([abstract] + unique_chunks),
+        embed_query_and_score(),
+    )
+
+    # Score the abstract and every chunk against the query in one product
+    all_scores = score_all(query_emb, embeddings)
+    scores = all_scores[1:][back]
 
     # Score abstract: average cosine similarity (×100) with LLM relevance score
-    cosine_abstract = max(cosine_similarity(query_emb, abstract_emb), 0.0) * 100
-    llm_abstract = score_abstract_relevance(query, abstract)
+    cosine_abstract = float(all_scores[0]) * 100
     abstract_score = (cosine_abstract + llm_abstract) / 2
 
-    # Score each chunk, clamp negatives to 0
-    scored_chunks = []
-    for i, chunk_emb in enumerate(chunk_embs):
-        score = max(cosine_similarity(query_emb, chunk_emb), 0.0)
-        scored_chunks.append(ChunkScore(
-            text = chunks[i],
-            score = round(score, 3),
-            chunk_index = i,
-        ))
-
-    # Sort by score descending, take top 20 candidates
-    scored_chunks.sort(key = lambda c: c.score, reverse = True)
-    top_20 = scored_chunks[:20]
+    # Keep the top 20 chunk candidates. Results built here from values this module just
+    # produced use model_construct, skipping pydantic validation in the per-chunk loops
+    top_idx = _top_k_indices(scores, 20)
+    top_20 = [
+        ChunkScore.model_construct(text = chunks[i], score = round(float(scores[i]), 3), chunk_index = i)
+        for i in top_idx.tolist()
+    ]
 
-    # LLM reranks to pick the best 5
-    candidate_dicts = [{"index": i, "text": c.text} for i, c in enumerate(top_20)]
-    best_indices = rerank_chunks(query, candidate_dicts)
-
-    # Collect the 5 winning chunks
-    selected = [top_20[idx] for idx in best_indices]
+    top_scores = scores[top_idx]
+    decisive = len(top_scores) <= 5 or (
+        top_scores[4] > RERANK_SHORTCIRCUIT_MIN_SCORE
+        and top_scores[4] - top_scores[5] > RERANK_SHORTCIRCUIT_GAP
+    )
+    if ENABLE_LLM_RERANK_SHORTCIRCUIT and decisive:
+        # Cosine already picked the best 5; the LLM only cleans them
+        selected = top_20[:5]
+        cleaned_texts = await clean_chunks([c.text for c in selected])
+    else:
+        # One LLM call picks the best 5 and cleans noise (figure captions, equations, etc.) from each
+        candidate_dicts = [{"index": i, "text": c.text} for i, c in enumerate(top_20)]
+        best_indices, cleaned_texts = await rerank_and_clean(query, candidate_dicts)
 
-    # LLM cleans noise (figure captions, equations, etc.) from each chunk
-    raw_texts = [c.text for c in selected]
-    cleaned_texts = clean_chunks(raw_texts)
+        # Collect the 5 winning chunks
+        selected = [top_20[idx] for idx in best_indices]
 
     top_chunks = []
     for chunk, cleaned in zip(selected, cleaned_texts):
-        top_chunks.append(ChunkScore(
+        top_chunks.append(ChunkScore.model_construct(
             text = cleaned,
             score = round(chunk.score * 10, 3),
             chunk_index = chunk.chunk_index,
@@ -104,39 +264,67 @@ def rank_chunks(query: str, abstract: str, chunks: list[str]) -> SimilarityResul
     )
 
 
-def rank_papers(query: str, papers: list[dict]) -> RelatedPapersResult:
+async def rank_papers(query: str, papers: list[dict]) -> RelatedPapersResult:
     """
-    rank_papers(query, papers) ranks a list of papers by cosine similarity
-    between the query and each paper's abstract.
+    rank_papers(query, papers) ranks a list of papers by their abstract's relevance to the query:
+    the average of cosine similarity (×10) and the LLM relevance score (÷10).
+    Abstract embeddings of papers seen before are gathered from the shared embedding store;
+    only new abstracts are embedded and then appended to it.
+    The per-paper LLM scores run concurrently with the embedding call, at most
+    MAX_CONCURRENT_LLM_CALLS at a time.
     Returns a RelatedPapersResult with papers sorted by score descending.
     """
     if not papers:
         return RelatedPapersResult(papers = [])
 
-    abstracts = [p["abstract"] for p in papers]
-    all_texts = [query] + abstracts
-    embeddings = get_embeddings(all_texts)
+    arxiv_ids = [p["arxiv_id"] for p in papers]
+    stored = lookup_rows(arxiv_ids)
+    hits = [i for i, arxiv_id in enumerate(arxiv_ids) if arxiv_id in stored]
+    misses = [i for i, arxiv_id in enumerate(arxiv_ids) if arxiv_id not in stored]
 
-    query_emb = embeddings[0]
-    abstract_embs = embeddings[1:]
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
 
+    async def llm_score(abstract: str, query_emb: np.ndarray) -> float:
+        async with semaphore:
+            return await score_abstract_relevance(query, abstract, query_emb = query_emb)
+
+    async def embed_query_and_score() -> tuple[np.ndarray, list[float]]:
+        # Only the LLM scores wait on the query embedding: their cache is looked up with it
+        query_emb = (await get_embeddings([query]))[0]
+        return query_emb, await asyncio.gather(*(llm_score(p["abstract"], query_emb) for p in papers))
+
+    embeddings, (query_emb, llm_scores) = await asyncio.gather(
+        get_embeddings([papers[i]["abstract"] for i in misses]),
+        embed_query_and_score(),
+    )
+
+    abstract_embs = np.empty((len(papers), len(query_emb)), dtype = np.float32)
+    abstract_embs[hits] = load_rows([stored[arxiv_ids[i]][0] for i in hits])
+    abstract_embs[misses] = embeddings
+    for i, emb in zip(misses, embeddings):
+        append_rows(arxiv_ids[i], emb)
+
+    cosine_scores = score_all(query_emb, abstract_embs) * 10
+    scores = (cosine_scores + np.asarray(llm_scores, dtype = np.float32) / 10) / 2
+
+    order = _top_k_indices(scores, len(papers))
+    final_scores = np.round(scores[order].astype(np.float64), 3).tolist()
     scored = []
-    for i, paper in enumerate(papers):
-        score = max(cosine_similarity(query_emb, abstract_embs[i]), 0.0) * 10
-        scored.append(RelatedPaper(
+    for i, score in zip(order.tolist(), final_scores):
+        paper = papers[i]
+        scored.append(RelatedPaper.model_construct(
             arxiv_id = paper["arxiv_id"],
             title = paper["title"],
             authors = paper["authors"],
             abstract = paper["abstract"],
             url = paper["url"],
-            score = round(score, 3),
+            score = score,
         ))
 
-    scored.sort(key = lambda p: p.score, reverse = True)
     return RelatedPapersResult(papers = scored)
 
 
-def retrieve_top_chunks(query: str, chunks: list[str], k: int = 15) -> list[ChunkScore]:
+async def retrieve_top_chunks(query: str, chunks: list[str], k: int = 15) -> list[ChunkScore]:
     """
     retrieve_top_chunks(query, chunks, k) finds the k most relevant chunks
     by cosine similarity to the query. Returns ChunkScore objects sorted by score.
@@ -144,20 +332,22 @@ def retrieve_top_chunks(query: str, chunks: list[str], k: int = 15) -> list[Chun
     if not chunks:
         return []
 
-    all_texts = [query] + chunks
-    embeddings = get_embeddings(all_texts)
+    unique_chunks, back = _dedupe_texts(chunks)
+    all_texts = [query] + unique_chunks
+    embeddings = await get_embeddings(all_texts)
 
     query_emb = embeddings[0]
     chunk_embs = embeddings[1:]
 
-    scored = []
-    for i, chunk_emb in enumerate(chunk_embs):
-        score = max(cosine_similarity(query_emb, chunk_emb), 0.0)
-        scored.append(ChunkScore(
-            text = chunks[i],
-            score = round(score * 10, 3),
-            chunk_index = i,
-        ))
+    if len(chunk_embs) > SCORING_THREAD_MIN_ROWS:
+        # Large sets are scored in a worker thread, leaving the event loop free for other requests
+        top_idx, top_scores = await asyncio.to_thread(topk_cosine, chunk_embs, query_emb, k, back)
+    else:
+        top_idx, top_scores = topk_cosine(chunk_embs, query_emb, k, back)
 
-    scored.sort(key = lambda c: c.score, reverse = True)
-    return scored[:k]
+    # Only the k winners are scaled (in one vectorized pass) and turned into ChunkScore objects
+    final_scores = np.round(top_scores.astype(np.float64) * 10, 3).tolist()
+    return [
+        ChunkScore.model_construct(text = chunks[i], score = score, chunk_index = i)
+        for i, score in zip(top_idx.tolist(), final_scores)
+    ]